@@ -1,10 +1,215 @@
+from moviepy import AudioArrayClip
 from moviepy import AudioFileClip
 from moviepy import CompositeAudioClip
 from moviepy import afx
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
+import atexit
+import logging
+import multiprocessing
+import os
+import shutil
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from pydub import AudioSegment
 
+try:
+    import numba
+except ImportError:  # Optional accelerator, see the "fast" extra
+    numba = None
+
+_log = logging.getLogger(__name__)
+_SAMPLE_RATE = 44100  # Every clip is decoded and written at this rate
+_READ_CHUNKSIZE = 50000  # MoviePy's default to_soundarray chunk
+# Samples per chunk piped to ffmpeg when saving; capped per clip by _safe_chunksize
+# so file-backed clips never ask their readers for more than they can serve.
+_WRITE_BUFFERSIZE = 1 << 18
+_LEAD_IN_FRACTION = 0.15  # Share of the background music skipped before looping
+
+_tmpdir: Optional[str] = None
+_tmpdir_lock = threading.Lock()
+
+
+def _get_tmpdir() -> str:
+    """
+    Returns the per-process scratch directory, creating it on first use and removing it at exit.
+    Only intermediate files belong here, never results a caller may keep.
+    """
+    global _tmpdir
+    with _tmpdir_lock:
+        if _tmpdir is None:
+            _tmpdir = tempfile.mkdtemp(prefix='acf_')
+            atexit.register(shutil.rmtree, _tmpdir, ignore_errors=True)
+        return _tmpdir
+
+
+def _file_readers(clip):
+    """Yields the ffmpeg readers behind a clip, looking through composite clips."""
+    reader = getattr(clip, 'reader', None)
+    if reader is not None:
+        yield reader
+    for child in getattr(clip, 'clips', None) or ():
+        yield from _file_readers(child)
+
+
+def _safe_chunksize(clip, limit: int) -> int:
+    """
+    Caps a chunk size for reading clip at half of its file readers' buffers.
+    FFMPEG_AudioReader buffers min(n_frames + 1, 200000) samples and mis-serves
+    larger requests (silence or an OSError), so short files need small chunks.
+    """
+    chunksize = limit
+    for reader in _file_readers(clip):
+        chunksize = min(chunksize, reader.buffersize // 2)
+    return max(1, chunksize)
+
+
+def _decode_samples(clip, fps: int) -> np.ndarray:
+    """
+    Decodes a clip into a float32 sound array in reader-safe chunks. MoviePy hands back
+    float64, so each chunk is narrowed into a preallocated array as it arrives; the full
+    float64 array never exists, and the in-memory kernels stream half the bytes.
+    """
+    arr = np.empty((int(fps * clip.duration), clip.nchannels), dtype=np.float32)
+    offset = 0
+    for chunk in clip.iter_chunks(chunksize=_safe_chunksize(clip, _READ_CHUNKSIZE), fps=fps):
+        arr[offset:offset + len(chunk)] = chunk.reshape(len(chunk), -1)
+        offset += len(chunk)
+    return arr
+
+
+def _array_clip(arr: np.ndarray, fps: int) -> AudioArrayClip:
+    """
+    Wraps a sound array in an AudioArrayClip. AudioArrayClip only sets duration, so
+    the end is set here too; CompositeAudioClip derives its duration from it.
+    """
+    return AudioArrayClip(arr, fps=fps).with_duration(len(arr) / fps)
+
+
+def _peak_np(arr: np.ndarray) -> float:
+    """Returns the absolute peak of a decoded sound array."""
+    if arr.size == 0:
+        return 0.0
+    return float(max(arr.max(), -arr.min()))
+
+
+def _scale_to_peak_np(arr: np.ndarray, target: float, lower: float, upper: float) -> float:
+    """
+    Scales a sound array in place so its peak becomes target, unless the peak
+    already lies within [lower, upper]. Returns the peak measured before scaling.
+    """
+    peak = _peak_np(arr)
+    if peak > 0.0 and (peak < lower or peak > upper):
+        arr *= target / peak
+    return peak
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _peak(arr):
+        """Numba version of _peak_np: a parallel max-reduce over every sample."""
+        peak = 0.0
+        for i in numba.prange(arr.shape[0]):
+            row_peak = 0.0
+            for c in range(arr.shape[1]):
+                row_peak = max(row_peak, abs(arr[i, c]))
+            peak = max(peak, row_peak)
+        return peak
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _scale_to_peak(arr, target, lower, upper):
+        """Numba version of _scale_to_peak_np: the compiled max-reduce followed by a parallel scale."""
+        peak = _peak(arr)
+        if peak > 0.0 and (peak < lower or peak > upper):
+            factor = target / peak
+            for i in numba.prange(arr.shape[0]):
+                for c in range(arr.shape[1]):
+                    arr[i, c] *= factor
+        return peak
+else:
+    _peak = _peak_np
+    _scale_to_peak = _scale_to_peak_np
+
+
+def _loop_scale_np(src: np.ndarray, dst: np.ndarray, factor: float) -> None:
+    """Fills dst with src repeated end to end and multiplied by factor, without tiling src first."""
+    for offset in range(0, len(dst), len(src)):
+        chunk = dst[offset:offset + len(src)]
+        np.multiply(src[:len(chunk)], factor, out=chunk)
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _loop_scale(src, dst, factor):
+        """Numba version of _loop_scale_np: every output sample is written once, in parallel."""
+        n = src.shape[0]
+        for i in numba.prange(dst.shape[0]):
+            for c in range(src.shape[1]):
+                dst[i, c] = src[i % n, c] * factor
+else:
+    _loop_scale = _loop_scale_np
+
+
+def _loop_fit_volume_band(src: np.ndarray, n_samples: int, min_volume: float = 0.1, max_volume: float = 0.3) -> np.ndarray:
+    """
+    Loops a sound array to n_samples and scales its peak into [min_volume, max_volume],
+    writing the result into a new array in a single pass.
+    The peak is moved straight to the middle of the band; a single multiply lands
+    there exactly, so there is nothing to iterate on.
+    """
+    src = src[:n_samples]
+    dst = np.empty((n_samples, src.shape[1]), dtype=src.dtype)
+    if len(src) == 0:
+        dst.fill(0)
+        return dst
+    target_volume = (max_volume + min_volume) / 2
+    detected_volume = _peak(src)
+    volume_factor = 1.0
+    if detected_volume > max_volume or detected_volume < min_volume:
+        _log.debug("📏 Volume out of range (%.2f), scaling to %.2f.", detected_volume, target_volume)
+        if detected_volume > 0:
+            volume_factor = target_volume / detected_volume
+    _loop_scale(src, dst, volume_factor)
+    _log.debug("✅ Volume is within the acceptable range.")
+    return dst
+
+
+def _segment_to_clip(segment: AudioSegment) -> AudioArrayClip:
+    """Wraps a pydub AudioSegment's PCM samples in an AudioArrayClip, shaped like an AudioFileClip."""
+    segment = segment.set_frame_rate(_SAMPLE_RATE).set_channels(2)
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32).reshape(-1, segment.channels)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return _array_clip(samples, _SAMPLE_RATE)
+
+
+def _load_speech_clip(speech_path: str, actions: List[Dict[str, Any]]) -> Union[AudioFileClip, AudioArrayClip]:
+    """
+    Loads speech through MoviePy directly. Only when ffmpeg cannot read the file is it
+    decoded with pydub, straight into memory, so no format goes through a lossy re-encode.
+    """
+    try:
+        return AudioClipFactory.create_audio_clip({"parameters": {"url": speech_path}, "actions": actions})
+    except FileNotFoundError:
+        raise
+    except OSError:
+        clip = _segment_to_clip(AudioSegment.from_file(speech_path))
+        _log.debug("🔄 Decoded speech file with pydub: %s", speech_path)
+        return AudioClipFactory.apply_audio_effects(clip, actions)
+
+
+def _render_asset_to_wav(job: Tuple[Dict[str, Any], str]) -> str:
+    """Pool worker: builds one asset and writes it as WAV, since clips cannot be pickled back."""
+    audio_asset, output_dir = job
+    clip = AudioClipFactory.create_audio_clip(audio_asset)
+    fd, output_path = tempfile.mkstemp(suffix='.wav', dir=output_dir)
+    os.close(fd)
+    # Workers share the parent's stdout; one progress bar per process would garble it.
+    AudioClipFactory.save_audio_clip(clip, output_path, logger=None)
+    clip.close()
+    return output_path
+
+
 class AudioClipFactory:
     """
     Factory class for creating and processing audio clips.
@@ -17,10 +222,34 @@ class AudioClipFactory:
         :param audio_asset: Dictionary containing audio asset parameters.
         :return: Processed AudioFileClip.
         """
-        clip = AudioFileClip(audio_asset['parameters']['url'])
-        print("🎵 Successfully loaded audio file.")
+        # ffmpeg resamples while decoding, so the rate conversion happens once here
+        # rather than again on every save. Clips are deliberately not memoized by URL:
+        # each AudioFileClip owns a stateful ffmpeg pipe, copies share it, and MoviePy
+        # offers no public way to open a fresh reader from an earlier probe.
+        clip = AudioFileClip(audio_asset['parameters']['url'], fps=_SAMPLE_RATE)
+        _log.debug("🎵 Successfully loaded audio file.")
         return AudioClipFactory.apply_audio_effects(clip, audio_asset.get('actions', []))
     
+    @staticmethod
+    def create_audio_clips_bulk(audio_assets: List[Dict[str, Any]], processes: Optional[int] = None) -> List[AudioFileClip]:
+        """
+        Creates audio clips for many assets at once on a pool of worker processes.
+        Each worker renders its asset to a WAV file which is then reopened here.
+        :param audio_assets: List of audio asset dictionaries.
+        :param processes: Number of worker processes, defaults to os.cpu_count(); never more than len(audio_assets).
+        :return: List of AudioFileClip objects, in the same order as audio_assets.
+        """
+        if not audio_assets:
+            return []
+        output_dir = tempfile.mkdtemp(prefix='bulk_', dir=_get_tmpdir())
+        jobs = [(audio_asset, output_dir) for audio_asset in audio_assets]
+        # Each spawned worker re-imports moviepy, so never start more than there are assets.
+        processes = min(len(audio_assets), processes or os.cpu_count() or 1)
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            paths = pool.map(_render_asset_to_wav, jobs)
+        _log.debug("🎵 Rendered %d audio assets in parallel.", len(paths))
+        return [AudioFileClip(path, fps=_SAMPLE_RATE) for path in paths]
+    
     @staticmethod
     def apply_audio_effects(clip: AudioFileClip, actions: List[Dict[str, Any]]) -> AudioFileClip:
         """
@@ -31,56 +260,74 @@ class AudioClipFactory:
         """
         for action in actions:
             if action['type'] == 'normalize_music':
-                print("🎚️ Applying normalization effect.")
-                clip = AudioClipFactory.normalize_music(clip)
+                _log.debug("🎚️ Applying normalization effect.")
+                clip = AudioClipFactory.normalize_music(clip, action.get('param', 1.0))
             elif action['type'] == 'loop_background_music':
-                print("🔄 Looping background music.")
+                _log.debug("🔄 Looping background music.")
                 clip = AudioClipFactory.loop_background_music(clip, action['param'])
             elif action['type'] == 'volume_percentage':
-                print(f"🔊 Adjusting volume by {action['param']*100}%. ")
+                _log.debug("🔊 Adjusting volume by %s%%.", action['param']*100)
                 clip = AudioClipFactory.adjust_volume(clip, action['param'])
         return clip
     
     @staticmethod
-    def normalize_music(clip: AudioFileClip) -> AudioFileClip:
-        """Applies normalization to the audio clip."""
-        return clip.with_effects([afx.AudioNormalize()])
+    def apply_audio_effects_fused(clip: AudioFileClip, actions: List[Dict[str, Any]]) -> AudioArrayClip:
+        """
+        Applies the same actions as apply_audio_effects, but on a single decoded sample array.
+        The clip is read through ffmpeg exactly once and every action works in memory.
+        :param clip: The audio clip to process.
+        :param actions: List of actions to apply.
+        :return: AudioArrayClip holding the processed samples.
+        """
+        fps = clip.fps
+        arr = _decode_samples(clip, fps)
+        for action in actions:
+            if action['type'] == 'normalize_music':
+                _log.debug("🎚️ Applying normalization effect.")
+                target_peak = action.get('param', 1.0)
+                _scale_to_peak(arr, target_peak, target_peak, target_peak)
+            elif action['type'] == 'loop_background_music':
+                _log.debug("🔄 Looping background music.")
+                target_duration = action['param']
+                arr = arr[int(len(arr) * _LEAD_IN_FRACTION):]
+                n_samples = int(target_duration * fps)
+                arr = _loop_fit_volume_band(arr, n_samples)
+                _log.debug("🔂 Music looped to %s seconds.", target_duration)
+            elif action['type'] == 'volume_percentage':
+                _log.debug("🔊 Adjusting volume by %s%%.", action['param']*100)
+                arr *= action['param']
+        return _array_clip(arr, fps)
+    
+    @staticmethod
+    def normalize_music(clip: AudioFileClip, target_peak: float = 1.0) -> AudioFileClip:
+        """Scales the audio clip so its peak reaches target_peak, using a single multiply."""
+        peak = clip.max_volume(chunksize=_safe_chunksize(clip, _READ_CHUNKSIZE))
+        if peak == 0:
+            return clip
+        return AudioClipFactory.adjust_volume(clip, target_peak / peak)
     
 
     @staticmethod
-    def loop_background_music(clip: AudioFileClip, target_duration: float) -> AudioFileClip:
+    def loop_background_music(clip: AudioFileClip, target_duration: float) -> AudioArrayClip:
         """Loops the background music to match a target duration, adjusting volume dynamically."""
-        start = clip.duration * 0.15
+        start = clip.duration * _LEAD_IN_FRACTION
         clip = clip.subclipped(start, clip.duration)
-        clip = clip.with_effects([afx.AudioLoop(duration=target_duration)])
-        print(f"🔂 Music looped to {target_duration} seconds.")
-        
-        # Enhanced Dynamic Volume Adjustment using while loop
-        max_volume_threshold = 0.3  # Upper threshold
-        min_volume_threshold = 0.1  # Lower threshold
-        smoothing_factor = 0.1  # Prevent extreme fluctuations
-        
-        volume_factor = 1.0
-        detected_volume = clip.max_volume()
-        
-        while detected_volume > max_volume_threshold or detected_volume < min_volume_threshold:
-            if detected_volume > max_volume_threshold:
-                volume_factor *= max_volume_threshold / detected_volume * (1 - smoothing_factor)
-                print(f"📉 Volume too high ({detected_volume:.2f}), reducing it smoothly.")
-            elif detected_volume < min_volume_threshold:
-                volume_factor *= min_volume_threshold / detected_volume * (1 + smoothing_factor)
-                print(f"📈 Volume too low ({detected_volume:.2f}), increasing it smoothly.")
-            
-            clip = AudioClipFactory.adjust_volume(clip, volume_factor)
-            detected_volume = clip.max_volume()
+        if clip.duration >= target_duration:
+            # Long enough already: trim before decoding so only the used span is read.
+            clip = clip.subclipped(0, target_duration)
         
-        print("✅ Volume is within the acceptable range.")
-        return clip
+        # Decode the source once; looping and volume fitting then happen in one
+        # pass over the output array instead of through AudioLoop/MultiplyVolume.
+        fps = clip.fps
+        src = _decode_samples(clip, fps)
+        arr = _loop_fit_volume_band(src, int(target_duration * fps))
+        _log.debug("🔂 Music looped to %s seconds.", target_duration)
+        return _array_clip(arr, fps)
 
     @staticmethod
     def adjust_volume(clip: AudioFileClip, factor: float) -> AudioFileClip:
         """Adjusts the volume of the audio clip by a given factor."""
-        print(f"🔊 Adjusting volume by a factor of {factor:.2f}.")
+        _log.debug("🔊 Adjusting volume by a factor of %.2f.", factor)
         return clip.with_effects([afx.MultiplyVolume(factor)])
     
     @staticmethod
@@ -91,68 +338,69 @@ class AudioClipFactory:
         :return: CompositeAudioClip if clips exist, else None.
         """
         if not audio_clips:
-            print("⚠️ No audio clips to merge.")
+            _log.warning("⚠️ No audio clips to merge.")
             return None
-        print("🎶 Merging multiple audio clips into one.")
+        _log.debug("🎶 Merging multiple audio clips into one.")
         return CompositeAudioClip(audio_clips)
     
     @staticmethod
-    def save_audio_clip(audio_clip: AudioFileClip, output_file: str, logger=None) -> None:
+    def save_audio_clip(audio_clip: AudioFileClip, output_file: str, logger="bar") -> None:
         """
         Saves the audio clip to the specified output file.
         :param audio_clip: The processed audio clip.
         :param output_file: Output file path.
-        :param logger: Optional logging callback.
+        :param logger: MoviePy logger: "bar" for a progress bar, None for silence, or a proglog logger.
         """
-        audio_clip.fps = 44100
-        print(f"💾 Saving audio clip to {output_file}.")
-        if logger:
-            audio_clip.write_audiofile(output_file, logger=logger)
-        else:
-            audio_clip.write_audiofile(output_file)
+        _log.debug("💾 Saving audio clip to %s.", output_file)
+        # Feed ffmpeg large chunks so the write is not dominated by pipe syscalls.
+        audio_clip.write_audiofile(output_file, fps=_SAMPLE_RATE, buffersize=_safe_chunksize(audio_clip, _WRITE_BUFFERSIZE), logger=logger)
     
     @staticmethod
-    def merge_speech_with_music(speech_path: str, music_path: str, speech_volume: float = 1.0, music_volume: float = 0.5) -> Union[CompositeAudioClip, None]:
+    def merge_speech_with_music(speech_path: str, music_path: str, speech_volume: float = 1.0, music_volume: float = 0.5, return_path: bool = False, output_path: Optional[str] = None) -> Union[AudioFileClip, str, None]:
         """
         Processes and merges speech and background music with customizable volume levels.
+        :param return_path: Return the saved MP3 path instead of reopening it as an AudioFileClip.
+        :param output_path: Where to save the merged MP3. Defaults to a new file in the system
+            temp directory, which is left in place for the caller.
+        :return: AudioFileClip (or its path when return_path is set), else None.
         """
-        if not speech_path.lower().endswith('.mp3'):
-            temp_speech_path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3').name
-            audio: AudioSegment = AudioSegment.from_file(speech_path)
-            audio.export(temp_speech_path, format='mp3')
-            speech_path = temp_speech_path
-            print(f"🔄 Converted speech file to MP3: {speech_path}")
+        speech_actions = [
+            {"type": "normalize_music", "param": speech_volume}
+        ]
         
-        speech_asset = {
-            "parameters": {"url": speech_path},
-            "actions": [
-                {"type": "normalize_music"},
-                {"type": "volume_percentage", "param": speech_volume}
-            ]
+        # The music loop length depends on the speech duration, so only loading the
+        # music can overlap with loading the speech. No normalize step is needed:
+        # loop_background_music rescales the peak itself.
+        music_asset = {
+            "parameters": {"url": music_path},
+            "actions": []
         }
         
-        speech_clip = AudioClipFactory.create_audio_clip(speech_asset)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            speech_future = executor.submit(_load_speech_clip, speech_path, speech_actions)
+            music_future = executor.submit(AudioClipFactory.create_audio_clip, music_asset)
+            speech_clip = speech_future.result()
+            music_clip = music_future.result()
+        
         if not speech_clip:
-            print("❌ Error: Could not load speech file.")
+            _log.error("❌ Error: Could not load speech file.")
             return None
         
-        music_asset = {
-            "parameters": {"url": music_path},
-            "actions": [
-                {"type": "normalize_music"},
+        if music_clip:
+            music_clip = AudioClipFactory.apply_audio_effects(music_clip, [
                 {"type": "loop_background_music", "param": speech_clip.duration},
                 {"type": "volume_percentage", "param": music_volume}
-            ]
-        }
-        
-        music_clip = AudioClipFactory.create_audio_clip(music_asset)
+            ])
         merged_clip = AudioClipFactory.merge_audio_clips([music_clip, speech_clip]) if music_clip else None
         
         if merged_clip:
-            output_path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3').name
+            if output_path is None:
+                output_path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3').name
             AudioClipFactory.save_audio_clip(merged_clip, output_path)
-            print(f"✅ Audio merged and saved as {output_path}")
+            _log.debug("✅ Audio merged and saved as %s", output_path)
+            if return_path:
+                return output_path
             return AudioFileClip(output_path)
         else:
-            print("❌ Error: No valid audio clips to merge.")
+            _log.error("❌ Error: No valid audio clips to merge.")
             return None
@@ -0,0 +1,205 @@
+import os
+import subprocess
+import sys
+import wave
+
+import numpy as np
+import pytest
+from moviepy import AudioFileClip
+
+from audioclip_factory import AudioClipFactory
+
+FPS = 44100
+
+
+def write_sine_wav(path, seconds, peak, freq):
+    """Writes a stereo 16-bit sine wave with the given peak amplitude."""
+    t = np.arange(int(seconds * FPS)) / FPS
+    samples = (peak * np.sin(2 * np.pi * freq * t) * 32767).astype(np.int16)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(FPS)
+        wav.writeframes(np.stack([samples, samples], axis=1).tobytes())
+    return str(path)
+
+
+def peak_of(clip):
+    # Small chunks: MoviePy's default read size mis-serves sub-second files.
+    return float(np.abs(clip.to_soundarray(buffersize=2000)).max())
+
+
+@pytest.fixture
+def music_path(tmp_path):
+    return write_sine_wav(tmp_path / "music.wav", seconds=10, peak=0.8, freq=220)
+
+
+@pytest.fixture
+def short_music_path(tmp_path):
+    return write_sine_wav(tmp_path / "short_music.wav", seconds=1.0, peak=0.8, freq=220)
+
+
+@pytest.fixture
+def speech_path(tmp_path):
+    return write_sine_wav(tmp_path / "speech.wav", seconds=4, peak=0.5, freq=440)
+
+
+@pytest.mark.parametrize("target_duration", [3.0, 20.0])
+def test_loop_background_music_fits_peak(music_path, target_duration):
+    clip = AudioClipFactory.loop_background_music(AudioFileClip(music_path), target_duration)
+    assert clip.duration == pytest.approx(target_duration, abs=1e-3)
+    assert clip.end == pytest.approx(target_duration, abs=1e-3)
+    assert peak_of(clip) == pytest.approx(0.2, abs=0.01)
+
+
+def test_loop_background_music_short_source(short_music_path):
+    clip = AudioClipFactory.loop_background_music(AudioFileClip(short_music_path), 5.0)
+    assert clip.duration == pytest.approx(5.0, abs=1e-3)
+    assert peak_of(clip) == pytest.approx(0.2, abs=0.01)
+
+
+def test_normalize_music_reaches_target_peak(short_music_path):
+    clip = AudioClipFactory.normalize_music(AudioFileClip(short_music_path), target_peak=0.5)
+    assert peak_of(clip) == pytest.approx(0.5, abs=0.01)
+
+
+def test_merge_speech_with_music(speech_path, music_path, tmp_path):
+    merged = AudioClipFactory.merge_speech_with_music(speech_path, music_path, output_path=str(tmp_path / "merged.mp3"))
+    assert merged.duration == pytest.approx(4.0, abs=0.1)
+    assert peak_of(merged) > 0.5
+
+
+def test_apply_audio_effects_fused_runs_full_chain(music_path):
+    normalized = AudioClipFactory.apply_audio_effects_fused(
+        AudioFileClip(music_path), [{"type": "normalize_music"}]
+    )
+    assert peak_of(normalized) == pytest.approx(1.0, abs=0.01)
+
+    clip = AudioClipFactory.apply_audio_effects_fused(AudioFileClip(music_path), [
+        {"type": "normalize_music"},
+        {"type": "loop_background_music", "param": 20.0},
+        {"type": "volume_percentage", "param": 0.5},
+    ])
+    assert clip.duration == pytest.approx(20.0, abs=1e-3)
+    assert peak_of(clip) == pytest.approx(0.1, abs=0.01)
+
+
+def test_apply_audio_effects_fused_trims_long_source(music_path):
+    clip = AudioClipFactory.apply_audio_effects_fused(
+        AudioFileClip(music_path), [{"type": "loop_background_music", "param": 3.0}]
+    )
+    assert clip.duration == pytest.approx(3.0, abs=1e-3)
+    assert peak_of(clip) == pytest.approx(0.2, abs=0.01)
+
+
+def test_apply_audio_effects_fused_short_source(short_music_path):
+    clip = AudioClipFactory.apply_audio_effects_fused(
+        AudioFileClip(short_music_path), [{"type": "normalize_music"}]
+    )
+    assert clip.duration == pytest.approx(1.0, abs=1e-3)
+    assert peak_of(clip) == pytest.approx(1.0, abs=0.01)
+
+
+def test_merge_speech_with_music_falls_back_to_pydub(speech_path, music_path, tmp_path, monkeypatch):
+    create_audio_clip = AudioClipFactory.create_audio_clip
+
+    def reject_speech(audio_asset):
+        if audio_asset['parameters']['url'] == speech_path:
+            raise OSError("ffmpeg cannot read this file")
+        return create_audio_clip(audio_asset)
+
+    monkeypatch.setattr(AudioClipFactory, "create_audio_clip", staticmethod(reject_speech))
+    merged = AudioClipFactory.merge_speech_with_music(speech_path, music_path, output_path=str(tmp_path / "merged.mp3"))
+    assert merged.duration == pytest.approx(4.0, abs=0.1)
+    assert peak_of(merged) > 0.5
+
+
+def test_merge_speech_with_music_return_path(speech_path, music_path, tmp_path):
+    output_path = str(tmp_path / "merged.mp3")
+    result = AudioClipFactory.merge_speech_with_music(speech_path, music_path, return_path=True, output_path=output_path)
+    assert result == output_path
+    assert peak_of(AudioFileClip(output_path)) > 0.5
+
+
+def test_merge_speech_with_music_output_outlives_process(speech_path, music_path, tmp_path):
+    output_path = str(tmp_path / "merged.mp3")
+    script = (
+        "from audioclip_factory import AudioClipFactory\n"
+        f"AudioClipFactory.merge_speech_with_music({speech_path!r}, {music_path!r}, output_path={output_path!r})\n"
+    )
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], cwd=repo_root, capture_output=True, check=True)
+    assert os.path.isfile(output_path)
+
+
+@pytest.mark.parametrize("seconds", [0.5, 10])
+def test_save_audio_clip_writes_audible_file(tmp_path, seconds):
+    source_path = write_sine_wav(tmp_path / "source.wav", seconds=seconds, peak=0.8, freq=220)
+    output_path = str(tmp_path / "saved.wav")
+    AudioClipFactory.save_audio_clip(AudioFileClip(source_path), output_path)
+    saved = AudioFileClip(output_path)
+    assert saved.duration == pytest.approx(seconds, abs=0.05)
+    assert peak_of(saved) == pytest.approx(0.8, abs=0.01)
+
+
+def test_save_audio_clip_keeps_caller_fps(music_path, tmp_path):
+    clip = AudioFileClip(music_path, fps=22050)
+    output_path = str(tmp_path / "saved.wav")
+    AudioClipFactory.save_audio_clip(clip, output_path, logger=None)
+    assert clip.fps == 22050
+    assert AudioFileClip(output_path).fps == FPS
+
+
+def test_create_audio_clips_bulk_keeps_order(speech_path, tmp_path, capfd):
+    short_path = write_sine_wav(tmp_path / "short.wav", seconds=0.5, peak=0.8, freq=220)
+    clips = AudioClipFactory.create_audio_clips_bulk([
+        {"parameters": {"url": speech_path}, "actions": []},
+        {"parameters": {"url": short_path}, "actions": [{"type": "volume_percentage", "param": 0.5}]},
+    ])
+    assert [clip.duration for clip in clips] == [pytest.approx(4.0, abs=0.05), pytest.approx(0.5, abs=0.05)]
+    assert peak_of(clips[0]) == pytest.approx(0.5, abs=0.01)
+    assert peak_of(clips[1]) == pytest.approx(0.4, abs=0.01)
+    assert "MoviePy - Writing audio" not in capfd.readouterr().out
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_peak_kernels_match_numpy(dtype):
+    from audioclip_factory import audio_clip_factory as acf
+
+    rng = np.random.default_rng(0)
+    arr = rng.uniform(-0.9, 0.9, size=(10007, 2)).astype(dtype)
+    arr[1234, 1] = -0.95
+    assert acf._peak(arr) == pytest.approx(acf._peak_np(arr))
+
+    expected = arr.copy()
+    assert acf._scale_to_peak_np(expected, 0.2, 0.1, 0.3) == pytest.approx(0.95)
+    assert acf._scale_to_peak(arr, 0.2, 0.1, 0.3) == pytest.approx(0.95)
+    np.testing.assert_allclose(arr, expected, rtol=1e-6)
+
+    in_band = expected.copy()
+    acf._scale_to_peak(in_band, 1.0, 0.1, 0.3)
+    np.testing.assert_array_equal(in_band, expected)
+
+
+@pytest.mark.parametrize("n_samples", [700, 1000, 2345])
+def test_loop_scale_matches_numpy(n_samples):
+    from audioclip_factory import audio_clip_factory as acf
+
+    src = np.random.default_rng(1).uniform(-1, 1, size=(1000, 2)).astype(np.float32)
+    expected = np.tile(src, (3, 1))[:n_samples] * np.float32(0.25)
+    dst = np.empty((n_samples, 2), dtype=np.float32)
+    acf._loop_scale(src, dst, 0.25)
+    np.testing.assert_allclose(dst, expected, rtol=1e-6)
+
+
+def test_loop_background_music_keeps_float32(music_path):
+    clip = AudioClipFactory.loop_background_music(AudioFileClip(music_path), 20.0)
+    assert clip.array.dtype == np.float32
+
+
+def test_create_audio_clip_gives_independent_clips(music_path):
+    asset = {"parameters": {"url": music_path}, "actions": []}
+    first = AudioClipFactory.create_audio_clip(asset)
+    second = AudioClipFactory.create_audio_clip(asset)
+    first.close()
+    assert peak_of(second) == pytest.approx(0.8, abs=0.01)